@@ -1,43 +1,45 @@
+import argparse
+import os
+import pickle
+import shutil
+import tempfile
+
 import pandas as pd
 import numpy as np
 
-def load_data(filepath, exam_suffix):
-    print(f"Loading {filepath}...")
-    try:
-        df = pd.read_excel(filepath, header=[1, 2])
-    except Exception as e:
-        print(f"Error reading {filepath}: {e}")
-        return None
-    
-    # Flatten columns
+SUBJECTS = ['语文', '数学', '英语', '生物', '道德与法治', '历史', '地理']
+
+def flatten_columns(columns):
+    # Flatten the two header rows (subject, metric) into single column names
     new_columns = []
     last_subject = None
-    
-    for i in range(len(df.columns)):
-        col = df.columns[i]
+
+    for i in range(len(columns)):
+        col = columns[i]
         subject = str(col[0]).strip()
         metric = str(col[1]).strip()
-        
+
         if "Unnamed" in subject or subject == "nan":
             subject = last_subject
         else:
             last_subject = subject
-            
+
         if "Unnamed" in metric or metric == "nan":
             metric = ""
-            
+
         if subject and metric:
             new_columns.append(f"{subject}_{metric}")
         elif subject:
             new_columns.append(subject)
         else:
-            new_columns.append(metric) 
-            
-    df.columns = new_columns
-    
+            new_columns.append(metric)
+
+    return new_columns
+
+def clean_frame(df, exam_suffix):
     # Clean up column names and map to standard names
     col_map = {}
-    
+
     for col in df.columns:
         new_name = col
         if "姓名" in col: new_name = "Name"
@@ -48,103 +50,164 @@ def load_data(filepath, exam_suffix):
         elif "总分" in col and "联考排名" in col: new_name = "Total_Joint_Rank"
         elif "总分" in col and "学校排名" in col: new_name = "Total_School_Rank"
         elif "总分" in col and "班级排名" in col: new_name = "Total_Class_Rank"
-        
+
         col_map[col] = new_name
-    
+
     df = df.rename(columns=col_map)
-    
+
     # Remove rows where Name or StudentID is missing
     df = df.dropna(subset=['Name', 'StudentID'])
-    
+
     # Convert numeric columns
     for col in df.columns:
         if "Score" in col or "Rank" in col or "分数" in col or "排名" in col:
             df[col] = pd.to_numeric(df[col], errors='coerce')
-            
+
     # Add suffix to all columns except join keys (StudentID)
     # We WILL suffix Name and Class to distinguish them
     cols_to_rename = {col: f"{col}_{exam_suffix}" for col in df.columns if col != 'StudentID'}
     df = df.rename(columns=cols_to_rename)
-    
+
     return df
 
-def analyze():
-    # Load data
-    df_monthly = load_data('diyiciyuekao.xlsx', 'Monthly')
-    df_midterm = load_data('qizhognchengji.xlsx', 'Midterm')
-    
-    if df_monthly is None or df_midterm is None:
-        return
+def load_data(filepath, exam_suffix):
+    print(f"Loading {filepath}...")
+    try:
+        df = pd.read_excel(filepath, header=[1, 2])
+    except Exception as e:
+        print(f"Error reading {filepath}: {e}")
+        return None
 
-    # Merge data on StudentID
-    print("Merging data...")
-    merged_df = pd.merge(df_monthly, df_midterm, on='StudentID', how='inner')
-    
+    df.columns = flatten_columns(df.columns)
+    return clean_frame(df, exam_suffix)
+
+def student_id_text(value):
+    # Text form of a raw StudentID cell, e.g. 2025105001.0 -> '2025105001'
+    if pd.isna(value):
+        return None
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    text = str(value).strip()
+    return text or None
+
+def iter_data_chunks(filepath, exam_suffix, chunksize=5000):
+    # Streaming version of load_data: reads the workbook row by row in
+    # read-only mode and yields cleaned frames of at most `chunksize` rows.
+    import openpyxl
+    from pandas.io.parsers import TextParser
+
+    wb = openpyxl.load_workbook(filepath, read_only=True, data_only=True)
+    try:
+        rows = wb.worksheets[0].iter_rows(values_only=True)
+        next(rows)  # Title row
+        top, bottom = next(rows), next(rows)
+        # Trailing blank header cells may be left out of a row, so pad both rows
+        header_width = max(len(top), len(bottom))
+        top = tuple(top) + (None,) * (header_width - len(top))
+        bottom = tuple(bottom) + (None,) * (header_width - len(bottom))
+
+        # Rebuild the same header tuples pd.read_excel(header=[1, 2]) produces
+        header = []
+        for i, (subject, metric) in enumerate(zip(top, bottom)):
+            subject = f"Unnamed: {i}_level_0" if subject is None else subject
+            metric = f"Unnamed: {i}_level_1" if metric is None else metric
+            header.append((subject, metric))
+        columns = flatten_columns(header)
+        width = len(columns)
+        # Same column clean_frame renames to StudentID
+        id_index = next((i for i, col in enumerate(columns) if "姓名" not in col and "学号" in col), None)
+
+        def to_frame(buffer):
+            df = TextParser(buffer, header=None).read()
+            if id_index is not None:
+                # TextParser guesses dtypes per chunk, so a chunk with a blank ID
+                # would read numeric IDs as floats; take the key from the raw cells
+                df[id_index] = [student_id_text(row[id_index]) for row in buffer]
+            df.columns = columns
+            return clean_frame(df, exam_suffix)
+
+        buffer = []
+        for row in rows:
+            buffer.append(tuple(row[:width]) + (None,) * (width - len(row)))
+            if len(buffer) >= chunksize:
+                yield to_frame(buffer)
+                buffer = []
+        if buffer:
+            yield to_frame(buffer)
+    finally:
+        wb.close()
+
+def add_deltas(merged_df):
     # Calculate Deltas
     # Total Score
     if 'Total_Score_Midterm' in merged_df.columns and 'Total_Score_Monthly' in merged_df.columns:
         merged_df['Delta_Total_Score'] = merged_df['Total_Score_Midterm'] - merged_df['Total_Score_Monthly']
-    
+
     # School Rank Improvement (Monthly - Midterm)
     if 'Total_School_Rank_Monthly' in merged_df.columns and 'Total_School_Rank_Midterm' in merged_df.columns:
         merged_df['Improvement_School_Rank'] = merged_df['Total_School_Rank_Monthly'] - merged_df['Total_School_Rank_Midterm']
-    
+
     if 'Total_Class_Rank_Monthly' in merged_df.columns and 'Total_Class_Rank_Midterm' in merged_df.columns:
         merged_df['Improvement_Class_Rank'] = merged_df['Total_Class_Rank_Monthly'] - merged_df['Total_Class_Rank_Midterm']
-    
+
     # Subject Analysis
-    subjects = ['语文', '数学', '英语', '生物', '道德与法治', '历史', '地理']
-    
-    for sub in subjects:
+    for sub in SUBJECTS:
         # Note: In load_data, we kept original subject names like "语文_分数"
         # So they became "语文_分数_Monthly"
         score_col_monthly = f"{sub}_分数_Monthly"
         score_col_midterm = f"{sub}_分数_Midterm"
-        
+
         if score_col_monthly in merged_df.columns and score_col_midterm in merged_df.columns:
             merged_df[f'Delta_{sub}'] = merged_df[score_col_midterm] - merged_df[score_col_monthly]
 
-    # Reorder columns
+    return merged_df
+
+def reorder_columns(columns):
     # We want Name_Midterm to be the main Name column
     basic_cols = ['StudentID', 'Name_Midterm', 'Class_Midterm', 'Name_Monthly', 'Class_Monthly']
-    score_cols = ['Total_Score_Monthly', 'Total_Score_Midterm', 'Delta_Total_Score', 
+    score_cols = ['Total_Score_Monthly', 'Total_Score_Midterm', 'Delta_Total_Score',
                   'Total_School_Rank_Monthly', 'Total_School_Rank_Midterm', 'Improvement_School_Rank',
                   'Total_Class_Rank_Monthly', 'Total_Class_Rank_Midterm', 'Improvement_Class_Rank']
-    
+
     # Filter valid columns
-    final_cols = [c for c in basic_cols if c in merged_df.columns] + \
-                 [c for c in score_cols if c in merged_df.columns] + \
-                 [c for c in merged_df.columns if c not in basic_cols and c not in score_cols]
-                 
-    merged_df = merged_df[final_cols]
-    
+    return [c for c in basic_cols if c in columns] + \
+           [c for c in score_cols if c in columns] + \
+           [c for c in columns if c not in basic_cols and c not in score_cols]
+
+# Columns averaged per class, and their names in the Class_Summary sheet
+CLASS_SUMMARY_COLS = {
+    'Total_Score_Monthly': 'Avg_Score_Monthly',
+    'Total_Score_Midterm': 'Avg_Score_Midterm',
+    'Delta_Total_Score': 'Avg_Score_Change',
+    'Improvement_School_Rank': 'Avg_Rank_Improvement'
+}
+
+def build_results(df_monthly, df_midterm):
+    # Merge data on StudentID
+    print("Merging data...")
+    merged_df = pd.merge(df_monthly, df_midterm, on='StudentID', how='inner')
+
+    merged_df = add_deltas(merged_df)
+
+    # Reorder columns
+    merged_df = merged_df[reorder_columns(merged_df.columns)]
+
     # Class Level Analysis
     print("Performing Class Analysis...")
     if 'Class_Midterm' in merged_df.columns:
         class_group = merged_df.groupby('Class_Midterm')
-        
-        agg_dict = {}
-        if 'Total_Score_Monthly' in merged_df.columns: agg_dict['Total_Score_Monthly'] = 'mean'
-        if 'Total_Score_Midterm' in merged_df.columns: agg_dict['Total_Score_Midterm'] = 'mean'
-        if 'Delta_Total_Score' in merged_df.columns: agg_dict['Delta_Total_Score'] = 'mean'
-        if 'Improvement_School_Rank' in merged_df.columns: agg_dict['Improvement_School_Rank'] = 'mean'
-        
+
+        agg_dict = {col: 'mean' for col in CLASS_SUMMARY_COLS if col in merged_df.columns}
+
         class_summary = class_group.agg(agg_dict).reset_index()
-        
-        rename_dict = {
-            'Total_Score_Monthly': 'Avg_Score_Monthly',
-            'Total_Score_Midterm': 'Avg_Score_Midterm',
-            'Delta_Total_Score': 'Avg_Score_Change',
-            'Improvement_School_Rank': 'Avg_Rank_Improvement'
-        }
-        class_summary = class_summary.rename(columns=rename_dict)
+        class_summary = class_summary.rename(columns=CLASS_SUMMARY_COLS)
     else:
         class_summary = pd.DataFrame()
 
     # Subject Level Analysis (Global)
     print("Performing Subject Analysis...")
     subject_summary_data = []
-    for sub in subjects:
+    for sub in SUBJECTS:
         score_col_monthly = f"{sub}_分数_Monthly"
         score_col_midterm = f"{sub}_分数_Midterm"
         if score_col_monthly in merged_df.columns and score_col_midterm in merged_df.columns:
@@ -158,15 +221,172 @@ def analyze():
             })
     subject_summary = pd.DataFrame(subject_summary_data)
 
+    return merged_df, class_summary, subject_summary
+
+def write_results(merged_df, class_summary, subject_summary, output_file='analysis_result.xlsx'):
     # Write to Excel
-    output_file = 'analysis_result.xlsx'
     print(f"Writing results to {output_file}...")
     with pd.ExcelWriter(output_file) as writer:
         merged_df.to_excel(writer, sheet_name='Student_Comparison', index=False)
         class_summary.to_excel(writer, sheet_name='Class_Summary', index=False)
         subject_summary.to_excel(writer, sheet_name='Subject_Summary', index=False)
-        
+
+def analyze():
+    # Load data
+    df_monthly = load_data('diyiciyuekao.xlsx', 'Monthly')
+    df_midterm = load_data('qizhognchengji.xlsx', 'Midterm')
+
+    if df_monthly is None or df_midterm is None:
+        return
+
+    write_results(*build_results(df_monthly, df_midterm))
+
+    print("Analysis complete!")
+
+def partition_to_disk(filepath, exam_suffix, partition_dir, num_partitions, chunksize):
+    # Hash-partition the rows of one workbook by StudentID into pickle files.
+    # Each partition file holds a sequence of pickled frames appended chunk by chunk.
+    # Returns whether every ID is numeric, i.e. whether pd.read_excel would
+    # have read the StudentID column as numbers.
+    print(f"Partitioning {filepath}...")
+    handles = {}
+    numeric_ids = True
+    try:
+        for chunk in iter_data_chunks(filepath, exam_suffix, chunksize):
+            # StudentID is text here (see iter_data_chunks), so equal IDs hash alike
+            numeric_ids = numeric_ids and bool(chunk['StudentID'].str.fullmatch(r'\d+').all())
+            hashes = pd.util.hash_pandas_object(chunk['StudentID'], index=False).to_numpy()
+            for p, part in chunk.groupby(hashes % num_partitions):
+                if p not in handles:
+                    path = os.path.join(partition_dir, f"{exam_suffix}_{p}.pkl")
+                    handles[p] = open(path, 'wb')
+                pickle.dump(part, handles[p], protocol=pickle.HIGHEST_PROTOCOL)
+    finally:
+        for f in handles.values():
+            f.close()
+    return numeric_ids
+
+def read_partition(partition_dir, exam_suffix, p):
+    path = os.path.join(partition_dir, f"{exam_suffix}_{p}.pkl")
+    if not os.path.exists(path):
+        return None
+    frames = []
+    with open(path, 'rb') as f:
+        while True:
+            try:
+                frames.append(pickle.load(f))
+            except EOFError:
+                break
+    return pd.concat(frames, ignore_index=True)
+
+def analyze_out_of_core(num_partitions=16, chunksize=5000, output_file='analysis_result.xlsx'):
+    # Same output as analyze(), but never holds more than one partition of
+    # each exam in memory: rows are hash-partitioned to disk by StudentID,
+    # joined partition by partition and streamed to the workbook.
+    import openpyxl
+
+    if num_partitions < 1:
+        raise ValueError(f"num_partitions must be at least 1, got {num_partitions}")
+    if chunksize < 1:
+        raise ValueError(f"chunksize must be at least 1, got {chunksize}")
+
+    partition_dir = tempfile.mkdtemp(prefix='exam_partitions_')
+    try:
+        numeric_ids = partition_to_disk('diyiciyuekao.xlsx', 'Monthly', partition_dir, num_partitions, chunksize)
+        numeric_ids &= partition_to_disk('qizhognchengji.xlsx', 'Midterm', partition_dir, num_partitions, chunksize)
+
+        wb = openpyxl.Workbook(write_only=True)
+        ws_students = wb.create_sheet('Student_Comparison')
+        ws_class = wb.create_sheet('Class_Summary')
+        ws_subject = wb.create_sheet('Subject_Summary')
+
+        # Running sums/counts so class and subject means need no second pass
+        class_parts = []
+        subject_sums = {}
+        subject_counts = {}
+        header = None
+
+        print(f"Merging data in {num_partitions} partitions...")
+        for p in range(num_partitions):
+            df_monthly = read_partition(partition_dir, 'Monthly', p)
+            df_midterm = read_partition(partition_dir, 'Midterm', p)
+            if df_monthly is None or df_midterm is None:
+                continue
+
+            merged_df = pd.merge(df_monthly, df_midterm, on='StudentID', how='inner')
+            del df_monthly, df_midterm
+            if numeric_ids:
+                # Write numeric IDs as numbers, as analyze() does
+                merged_df['StudentID'] = merged_df['StudentID'].astype('int64')
+            merged_df = add_deltas(merged_df)
+            merged_df = merged_df[reorder_columns(merged_df.columns)]
+
+            if header is None:
+                header = list(merged_df.columns)
+                ws_students.append(header)
+            for row in merged_df[header].itertuples(index=False, name=None):
+                ws_students.append([None if pd.isna(v) else v for v in row])
+
+            if 'Class_Midterm' in merged_df.columns:
+                agg_cols = [c for c in CLASS_SUMMARY_COLS if c in merged_df.columns]
+                class_parts.append(merged_df.groupby('Class_Midterm')[agg_cols].agg(['sum', 'count']))
+
+            for sub in SUBJECTS:
+                for col in (f"{sub}_分数_Monthly", f"{sub}_分数_Midterm"):
+                    if col in merged_df.columns:
+                        subject_sums[col] = subject_sums.get(col, 0.0) + merged_df[col].sum()
+                        subject_counts[col] = subject_counts.get(col, 0) + merged_df[col].count()
+
+        # Class Level Analysis
+        print("Performing Class Analysis...")
+        if class_parts:
+            totals = pd.concat(class_parts).groupby(level=0).sum()
+            class_summary = pd.DataFrame(index=totals.index)
+            for col in totals.columns.get_level_values(0).unique():
+                counts = totals[(col, 'count')]
+                class_summary[col] = totals[(col, 'sum')] / counts.where(counts > 0)
+            class_summary = class_summary.reset_index().rename(columns=CLASS_SUMMARY_COLS)
+            ws_class.append(list(class_summary.columns))
+            for row in class_summary.itertuples(index=False, name=None):
+                ws_class.append([None if pd.isna(v) else v for v in row])
+
+        # Subject Level Analysis (Global)
+        print("Performing Subject Analysis...")
+        subject_rows = []
+        for sub in SUBJECTS:
+            score_col_monthly = f"{sub}_分数_Monthly"
+            score_col_midterm = f"{sub}_分数_Midterm"
+            if score_col_monthly in subject_sums and score_col_midterm in subject_sums:
+                mean_monthly = subject_sums[score_col_monthly] / subject_counts[score_col_monthly] if subject_counts[score_col_monthly] else np.nan
+                mean_midterm = subject_sums[score_col_midterm] / subject_counts[score_col_midterm] if subject_counts[score_col_midterm] else np.nan
+                subject_rows.append([sub, mean_monthly, mean_midterm, mean_midterm - mean_monthly])
+        if subject_rows:
+            ws_subject.append(['Subject', 'Avg_Score_Monthly', 'Avg_Score_Midterm', 'Delta'])
+            for row in subject_rows:
+                ws_subject.append([None if pd.isna(v) else v for v in row])
+
+        print(f"Writing results to {output_file}...")
+        wb.save(output_file)
+    finally:
+        shutil.rmtree(partition_dir, ignore_errors=True)
+
     print("Analysis complete!")
 
+def positive_int(value):
+    number = int(value)
+    if number < 1:
+        raise argparse.ArgumentTypeError(f"必须是正整数: {value}")
+    return number
+
 if __name__ == "__main__":
-    analyze()
+    parser = argparse.ArgumentParser(description="月考 vs 期中 成绩对比分析")
+    parser.add_argument('--out-of-core', action='store_true',
+                        help="按学号哈希分区到磁盘后逐分区合并，适用于超出内存的大名单")
+    parser.add_argument('--partitions', type=positive_int, default=16, help="磁盘分区数 (默认 16)")
+    parser.add_argument('--chunksize', type=positive_int, default=5000, help="每次读取的行数 (默认 5000)")
+    args = parser.parse_args()
+
+    if args.out_of_core:
+        analyze_out_of_core(num_partitions=args.partitions, chunksize=args.chunksize)
+    else:
+        analyze()
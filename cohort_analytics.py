@@ -0,0 +1,248 @@
+import math
+
+import numpy as np
+import pandas as pd
+
+from analyze_data_full import SUBJECTS
+
+# Rank bands on the joint (联考) rank: 1-100, 101-300, 301-500, 501+
+RANK_BAND_EDGES = [100, 300, 500]
+# A student is flagged when the joint rank fell by more than this many places
+RANK_DROP_THRESHOLD = 100
+SIGNIFICANCE_LEVEL = 0.05
+OVERALL_LABEL = '全部'
+TOTAL_LABEL = '总分'
+
+def _betainc(a, b, x, max_iter=1000, eps=1e-14):
+    # Regularized incomplete beta I_x(a, b) for arrays, via the continued
+    # fraction (Numerical Recipes betacf), evaluated element-wise in lockstep.
+    a, b, x = np.broadcast_arrays(np.asarray(a, float), np.asarray(b, float), np.asarray(x, float))
+    out = np.full(x.shape, np.nan)
+    out[x <= 0] = 0.0
+    out[x >= 1] = 1.0
+    inner = (x > 0) & (x < 1)
+    if not inner.any():
+        return out
+
+    # Use the symmetry relation where the fraction converges faster
+    swap = inner & (x >= (a + 1) / (a + b + 2))
+    aa = np.where(swap, b, a)[inner]
+    bb = np.where(swap, a, b)[inner]
+    xx = np.where(swap, 1 - x, x)[inner]
+
+    lgamma = np.frompyfunc(math.lgamma, 1, 1)
+    log_front = (lgamma(aa + bb) - lgamma(aa) - lgamma(bb)).astype(float) \
+        + aa * np.log(xx) + bb * np.log1p(-xx)
+
+    tiny = 1e-300
+    qab, qap, qam = aa + bb, aa + 1, aa - 1
+    c = np.ones_like(xx)
+    d = 1 - qab * xx / qap
+    d = 1 / np.where(np.abs(d) < tiny, tiny, d)
+    h = d.copy()
+    done = np.zeros(xx.shape, dtype=bool)
+    for m in range(1, max_iter + 1):
+        m2 = 2 * m
+        for num in (m * (bb - m) * xx / ((qam + m2) * (aa + m2)),
+                    -(aa + m) * (qab + m) * xx / ((aa + m2) * (qap + m2))):
+            d = 1 + num * d
+            d = 1 / np.where(np.abs(d) < tiny, tiny, d)
+            c = 1 + num / c
+            c = np.where(np.abs(c) < tiny, tiny, c)
+            delta = d * c
+            h = np.where(done, h, h * delta)
+        done |= np.abs(delta - 1) < eps
+        if done.all():
+            break
+
+    result = np.exp(log_front) * h / aa
+    out[inner] = np.where(swap[inner], 1 - result, result)
+    return out
+
+def t_test_p_value(t, df):
+    # Two-sided p-value of Student's t distribution
+    t = np.asarray(t, float)
+    df = np.asarray(df, float)
+    p = np.full(np.broadcast(t, df).shape, np.nan)
+    tt, dd = np.broadcast_arrays(t, df)
+    ok = np.isfinite(tt) & (dd > 0)
+    if ok.any():
+        p[ok] = _betainc(dd[ok] / 2, 0.5, dd[ok] / (dd[ok] + tt[ok] ** 2))
+    # Zero spread with a non-zero mean change (every delta identical): t is infinite
+    p[np.isinf(tt) & (dd > 0)] = 0.0
+    return p
+
+def _score_matrices(df):
+    # (n_students x n_subjects) score matrices for both exams, total score first
+    labels, monthly, midterm = [], [], []
+    pairs = [(TOTAL_LABEL, 'Total_Score_Monthly', 'Total_Score_Midterm')] + \
+            [(sub, f"{sub}_分数_Monthly", f"{sub}_分数_Midterm") for sub in SUBJECTS]
+    for label, col_monthly, col_midterm in pairs:
+        if col_monthly in df.columns and col_midterm in df.columns:
+            labels.append(label)
+            monthly.append(col_monthly)
+            midterm.append(col_midterm)
+    return (labels,
+            df[monthly].to_numpy(dtype=float),
+            df[midterm].to_numpy(dtype=float))
+
+def paired_tests(df, class_col='Class_Midterm'):
+    # Paired t-tests (midterm - monthly) for every class x subject cell, plus an
+    # overall row per subject. All groups are reduced at once with bincount over
+    # a flattened (group, subject) index instead of looping over groups.
+    labels, monthly, midterm = _score_matrices(df)
+    n_rows, n_sub = monthly.shape
+    if n_sub == 0:
+        return []
+
+    if class_col in df.columns:
+        codes, classes = pd.factorize(df[class_col], sort=True)
+    else:
+        codes, classes = np.full(n_rows, -1), pd.Index([])
+    # Group 0 is the whole cohort, classes are 1..G; students without a class
+    # only count towards the overall row
+    group_ids = [np.zeros(n_rows, dtype=np.int64)]
+    group_ids.append(np.where(codes >= 0, codes + 1, -1))
+    n_groups = len(classes) + 1
+
+    delta = midterm - monthly
+    valid = ~np.isnan(delta)
+
+    gid = np.concatenate(group_ids)                        # (2n,)
+    flat = gid[:, None] * n_sub + np.arange(n_sub)          # (2n, k)
+    keep = np.tile(valid, (2, 1)) & (gid[:, None] >= 0)
+    flat = flat[keep]
+    size = n_groups * n_sub
+
+    def group_sum(values):
+        return np.bincount(flat, weights=np.tile(values, (2, 1))[keep], minlength=size)
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        count = np.bincount(flat, minlength=size).astype(float)
+        mean_d = group_sum(np.where(valid, delta, 0)) / count
+        mean_m = group_sum(np.where(valid, monthly, 0)) / count
+        mean_t = group_sum(np.where(valid, midterm, 0)) / count
+
+        # Second pass on values centred on their own group mean (overall or
+        # class) for a numerically stable variance
+        stacked = np.tile(np.where(valid, delta, 0), (2, 1))
+        stacked = stacked - mean_d.reshape(n_groups, n_sub)[np.maximum(gid, 0)]
+        sq = np.bincount(flat, weights=(stacked ** 2)[keep], minlength=size)
+        sd_d = np.sqrt(sq / (count - 1))
+
+        t = mean_d / (sd_d / np.sqrt(count))
+        p = t_test_p_value(t, count - 1)
+        dz = mean_d / sd_d
+
+    results = []
+    group_labels = [OVERALL_LABEL] + list(classes)
+    for g in range(n_groups):
+        for j in range(n_sub):
+            i = g * n_sub + j
+            if count[i] == 0:
+                continue
+            results.append({
+                'class': _clean(group_labels[g]),
+                'subject': labels[j],
+                'n': int(count[i]),
+                'mean_monthly': _clean(mean_m[i]),
+                'mean_midterm': _clean(mean_t[i]),
+                'mean_delta': _clean(mean_d[i]),
+                'sd_delta': _clean(sd_d[i]),
+                't': _clean(t[i]),
+                'p_value': _clean(p[i]),
+                'effect_size_dz': _clean(dz[i]),
+                'significant': bool(p[i] < SIGNIFICANCE_LEVEL) if np.isfinite(p[i]) else False
+            })
+    return results
+
+def _band_labels(edges):
+    labels = []
+    lower = 1
+    for edge in edges:
+        labels.append(f"{lower}-{edge}")
+        lower = edge + 1
+    labels.append(f"{lower}+")
+    return labels
+
+def rank_band_transitions(df, rank_col='Total_Joint_Rank', class_col='Class_Midterm', edges=RANK_BAND_EDGES):
+    # Counts of students moving from each monthly rank band (rows) to each
+    # midterm rank band (columns), overall and per class, in one bincount
+    before = df.get(f"{rank_col}_Monthly")
+    after = df.get(f"{rank_col}_Midterm")
+    labels = _band_labels(edges)
+    n_bands = len(labels)
+    if before is None or after is None:
+        return {'labels': labels, 'overall': [], 'by_class': {}}
+
+    before = before.to_numpy(dtype=float)
+    after = after.to_numpy(dtype=float)
+    valid = ~np.isnan(before) & ~np.isnan(after)
+    band_from = np.searchsorted(edges, before[valid], side='left')
+    band_to = np.searchsorted(edges, after[valid], side='left')
+
+    overall = np.bincount(band_from * n_bands + band_to, minlength=n_bands * n_bands)
+
+    by_class = {}
+    if class_col in df.columns:
+        codes, classes = pd.factorize(df[class_col], sort=True)
+        codes = codes[valid]
+        has_class = codes >= 0
+        cells = (codes[has_class] * n_bands + band_from[has_class]) * n_bands + band_to[has_class]
+        matrices = np.bincount(cells, minlength=len(classes) * n_bands * n_bands)
+        matrices = matrices.reshape(len(classes), n_bands, n_bands)
+        by_class = {_clean(c): matrices[g].tolist() for g, c in enumerate(classes)}
+
+    return {
+        'labels': labels,
+        'overall': overall.reshape(n_bands, n_bands).tolist(),
+        'by_class': by_class
+    }
+
+def rank_drop_flags(df, rank_col='Total_Joint_Rank', threshold=RANK_DROP_THRESHOLD):
+    # Students whose rank fell by more than `threshold` places, largest drop first
+    before = df.get(f"{rank_col}_Monthly")
+    after = df.get(f"{rank_col}_Midterm")
+    if before is None or after is None:
+        return {'threshold': threshold, 'students': []}
+
+    drop = (after - before).to_numpy(dtype=float)   # Positive = fell behind
+    mask = drop > threshold
+    flagged = df.loc[mask]
+    flagged_drop = drop[mask]
+    order = np.argsort(-flagged_drop, kind='stable')
+
+    students = []
+    for i in order:
+        row = flagged.iloc[i]
+        students.append({
+            'name': row.get('Name_Midterm'),
+            'student_id': row.get('StudentID'),
+            'class': _clean(row.get('Class_Midterm')),
+            'rank_monthly': _rank(row[f"{rank_col}_Monthly"]),
+            'rank_midterm': _rank(row[f"{rank_col}_Midterm"]),
+            'rank_drop': _rank(flagged_drop[i])
+        })
+    return {'threshold': threshold, 'students': students}
+
+def _clean(value):
+    # Plain Python scalars for json; NaN and +-inf become null so the file stays valid JSON
+    if isinstance(value, np.generic):
+        value = value.item()
+    if isinstance(value, float) and not math.isfinite(value):
+        return None
+    return value
+
+def _rank(value):
+    # Ranks come out as floats once the column holds a NaN; whole numbers back to int
+    value = _clean(value)
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    return value
+
+def compute(df_students):
+    return {
+        'paired_tests': paired_tests(df_students),
+        'rank_band_transitions': rank_band_transitions(df_students),
+        'rank_drop_flags': rank_drop_flags(df_students)
+    }
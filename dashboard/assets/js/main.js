@@ -19,6 +19,9 @@ function initDashboard(data) {
     
     // Setup Search
     setupSearch(data.students);
+
+    // Setup Roster Table
+    setupRosterTable(data.students);
 }
 
 function renderOverviewCharts(data) {
@@ -0,0 +1,78 @@
+// Roster table worker: sorting and filtering over typed arrays,
+// off the main thread so the charts stay responsive.
+
+let size = 0;
+let columns = {};      // key -> Float64Array (numeric sort keys)
+let searchText = [];   // lower-cased "name id" per student, for filtering
+let classCodes = null; // Int32Array, index into the class list
+let sortedCache = {};  // key -> Uint32Array permutation (ascending)
+
+self.onmessage = (e) => {
+    const msg = e.data;
+    if (msg.type === 'init') {
+        init(msg);
+        self.postMessage({ type: 'ready', size: size });
+    } else if (msg.type === 'query') {
+        const start = performance.now();
+        const indices = query(msg);
+        self.postMessage({
+            type: 'result',
+            seq: msg.seq,
+            indices: indices,
+            elapsed: performance.now() - start
+        }, [indices.buffer]);
+    }
+};
+
+function init(msg) {
+    size = msg.size;
+    columns = msg.columns;
+    classCodes = msg.classCodes;
+    searchText = msg.searchText;
+    sortedCache = {};
+
+    // Names sort by locale, so turn them into a numeric key once up front
+    const collator = new Intl.Collator('zh-CN');
+    const order = new Uint32Array(size);
+    for (let i = 0; i < size; i++) order[i] = i;
+    const names = msg.names;
+    order.sort((a, b) => collator.compare(names[a], names[b]) || a - b);
+    const nameKey = new Float64Array(size);
+    for (let r = 0; r < size; r++) nameKey[order[r]] = r;
+    columns.name = nameKey;
+    sortedCache.name = order;
+}
+
+function sortedBy(key) {
+    if (!sortedCache[key]) {
+        const values = columns[key];
+        const order = new Uint32Array(size);
+        for (let i = 0; i < size; i++) order[i] = i;
+        // Ties fall back to roster order so results are deterministic
+        order.sort((a, b) => (values[a] - values[b]) || (a - b));
+        sortedCache[key] = order;
+    }
+    return sortedCache[key];
+}
+
+function query(msg) {
+    const order = msg.sortKey ? sortedBy(msg.sortKey) : null;
+    const text = (msg.text || '').trim().toLowerCase();
+    const classCode = msg.classCode;
+    const out = new Uint32Array(size);
+    let n = 0;
+
+    for (let r = 0; r < size; r++) {
+        let i;
+        if (order) {
+            i = msg.sortDir === 'desc' ? order[size - 1 - r] : order[r];
+        } else {
+            i = r;
+        }
+        if (classCode >= 0 && classCodes[i] !== classCode) continue;
+        if (text && searchText[i].indexOf(text) === -1) continue;
+        out[n++] = i;
+    }
+    // Copy into an exact-length buffer so the transfer carries no slack
+    return out.slice(0, n);
+}
@@ -0,0 +1,182 @@
+// Full roster table: virtualized rendering (only visible rows exist in the DOM),
+// sorting/filtering delegated to roster-worker.js.
+
+const ROSTER_ROW_HEIGHT = 32;
+const ROSTER_OVERSCAN = 6;
+
+const ROSTER_COLUMNS = [
+    { key: 'name', title: '姓名', value: s => s.name },
+    { key: 'class', title: '班级', value: s => `${s.class}班` },
+    { key: 'student_id', title: '学号', value: s => s.student_id, sortable: false },
+    { key: 'total_score_monthly', title: '月考总分', value: s => s.total_score_monthly },
+    { key: 'total_score_midterm', title: '期中总分', value: s => s.total_score_midterm },
+    { key: 'total_rank_monthly', title: '月考联考排名', value: s => s.total_rank_monthly },
+    { key: 'total_rank_midterm', title: '期中联考排名', value: s => s.total_rank_midterm },
+    { key: 'rank_change', title: '排名变化', value: s => (s.rank_change > 0 ? '+' : '') + s.rank_change, change: true }
+];
+
+function setupRosterTable(students) {
+    const header = document.getElementById('rosterHeader');
+    const viewport = document.getElementById('rosterViewport');
+    const spacer = document.getElementById('rosterSpacer');
+    const filterInput = document.getElementById('rosterFilter');
+    const classSelect = document.getElementById('rosterClass');
+    const countEl = document.getElementById('rosterCount');
+
+    const state = {
+        indices: new Uint32Array(0),
+        sortKey: null,
+        sortDir: 'asc',
+        seq: 0,
+        pool: []
+    };
+
+    // Class list for the filter dropdown; codes are what the worker compares
+    const classList = [...new Set(students.map(s => s.class))].sort((a, b) => {
+        const na = Number(a), nb = Number(b);
+        return (isNaN(na) || isNaN(nb)) ? String(a).localeCompare(String(b)) : na - nb;
+    });
+    const classIndex = new Map(classList.map((c, i) => [c, i]));
+    classList.forEach((c, i) => {
+        const opt = document.createElement('option');
+        opt.value = i;
+        opt.textContent = `${c}班`;
+        classSelect.appendChild(opt);
+    });
+
+    // Column-oriented typed arrays for the worker
+    const size = students.length;
+    const numericKeys = ['total_score_monthly', 'total_score_midterm', 'total_rank_monthly', 'total_rank_midterm', 'rank_change'];
+    const columns = {};
+    numericKeys.forEach(key => {
+        const arr = new Float64Array(size);
+        for (let i = 0; i < size; i++) arr[i] = Number(students[i][key]) || 0;
+        columns[key] = arr;
+    });
+    const classCodes = new Int32Array(size);
+    const classKey = new Float64Array(size);
+    for (let i = 0; i < size; i++) {
+        classCodes[i] = classIndex.get(students[i].class);
+        classKey[i] = classCodes[i];
+    }
+    columns.class = classKey;
+    const names = students.map(s => String(s.name));
+    const searchText = students.map(s => `${s.name} ${s.student_id}`.toLowerCase());
+
+    const worker = new Worker('assets/js/roster-worker.js');
+    const transfer = Object.values(columns).map(a => a.buffer).concat([classCodes.buffer]);
+    worker.postMessage({ type: 'init', size, columns, classCodes, names, searchText }, transfer);
+
+    worker.onmessage = (e) => {
+        const msg = e.data;
+        if (msg.type === 'ready') {
+            requestQuery();
+        } else if (msg.type === 'result' && msg.seq === state.seq) {
+            // Drop stale results; only the latest query is rendered
+            state.indices = msg.indices;
+            viewport.scrollTop = 0;
+            countEl.textContent = `共 ${state.indices.length} 人`;
+            spacer.style.height = `${state.indices.length * ROSTER_ROW_HEIGHT}px`;
+            renderRows();
+        }
+    };
+
+    function requestQuery() {
+        state.seq++;
+        worker.postMessage({
+            type: 'query',
+            seq: state.seq,
+            sortKey: state.sortKey,
+            sortDir: state.sortDir,
+            classCode: classSelect.value === '' ? -1 : Number(classSelect.value),
+            text: filterInput.value
+        });
+    }
+
+    // Header
+    ROSTER_COLUMNS.forEach(col => {
+        const cell = document.createElement('div');
+        cell.className = 'roster-cell';
+        cell.textContent = col.title;
+        if (col.sortable !== false) {
+            cell.classList.add('sortable');
+            cell.onclick = () => {
+                if (state.sortKey === col.key) {
+                    state.sortDir = state.sortDir === 'asc' ? 'desc' : 'asc';
+                } else {
+                    state.sortKey = col.key;
+                    state.sortDir = 'asc';
+                }
+                header.querySelectorAll('.roster-cell').forEach(c => c.removeAttribute('data-sort'));
+                cell.setAttribute('data-sort', state.sortDir);
+                requestQuery();
+            };
+        }
+        header.appendChild(cell);
+    });
+
+    // Row pool: reuse a fixed set of row elements instead of rebuilding the DOM
+    function ensurePool(count) {
+        while (state.pool.length < count) {
+            const row = document.createElement('div');
+            row.className = 'roster-row';
+            ROSTER_COLUMNS.forEach(() => {
+                const cell = document.createElement('div');
+                cell.className = 'roster-cell';
+                row.appendChild(cell);
+            });
+            row.onclick = () => {
+                if (row.dataset.index !== '') showStudentDetail(students[Number(row.dataset.index)]);
+            };
+            spacer.appendChild(row);
+            state.pool.push(row);
+        }
+    }
+
+    function renderRows() {
+        const total = state.indices.length;
+        const first = Math.max(0, Math.floor(viewport.scrollTop / ROSTER_ROW_HEIGHT) - ROSTER_OVERSCAN);
+        const visible = Math.ceil(viewport.clientHeight / ROSTER_ROW_HEIGHT) + ROSTER_OVERSCAN * 2;
+        const last = Math.min(total, first + visible);
+        ensurePool(visible);
+
+        state.pool.forEach((row, p) => {
+            const r = first + p;
+            if (r >= last) {
+                row.style.display = 'none';
+                row.dataset.index = '';
+                return;
+            }
+            const student = students[state.indices[r]];
+            row.style.display = '';
+            row.style.transform = `translateY(${r * ROSTER_ROW_HEIGHT}px)`;
+            row.dataset.index = state.indices[r];
+            ROSTER_COLUMNS.forEach((col, c) => {
+                const cell = row.children[c];
+                cell.textContent = col.value(student);
+                if (col.change) {
+                    const change = student.rank_change;
+                    cell.className = 'roster-cell ' + (change > 0 ? 'positive' : (change < 0 ? 'negative' : ''));
+                }
+            });
+        });
+    }
+
+    let frame = null;
+    const scheduleRender = () => {
+        if (frame) return;
+        frame = requestAnimationFrame(() => {
+            frame = null;
+            renderRows();
+        });
+    };
+    viewport.addEventListener('scroll', scheduleRender);
+    window.addEventListener('resize', scheduleRender);
+
+    let filterTimer = null;
+    filterInput.addEventListener('input', () => {
+        clearTimeout(filterTimer);
+        filterTimer = setTimeout(requestQuery, 100);
+    });
+    classSelect.addEventListener('change', requestQuery);
+}
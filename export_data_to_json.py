@@ -1,7 +1,11 @@
 import pandas as pd
 import json
+import os
+import tempfile
 import numpy as np
 
+import cohort_analytics
+
 def load_data():
     filename = 'analysis_result.xlsx'
     print(f"Loading data from {filename}...")
@@ -15,12 +19,18 @@ def load_data():
         print(f"Error loading data: {e}")
         return None, None, None
 
-def convert_to_json():
-    df_students, df_class, df_subject = load_data()
-    
-    if df_students is None:
-        return
+def as_read_back(df):
+    # Whole-number float columns (e.g. Class after a note row was dropped) are
+    # read back from analysis_result.xlsx as int64; convert frames that skip the
+    # workbook the same way so data.json comes out identical
+    df = df.copy()
+    for col in df.columns:
+        values = df[col]
+        if values.dtype.kind == 'f' and np.isfinite(values).all() and (values == values.round()).all():
+            df[col] = values.astype('int64')
+    return df
 
+def build_dashboard_data(df_students, df_class, df_subject):
     # 1. Global Stats
     global_stats = {
         'total_students': int(len(df_students)),
@@ -95,15 +105,20 @@ def convert_to_json():
             
         students_list.append(student_data)
 
-    final_data = {
+    # 6. Cohort Analytics (paired tests, rank-band transitions, rank-drop flags)
+    analytics = cohort_analytics.compute(df_students)
+
+    return {
         'global_stats': global_stats,
         'subject_stats': subject_stats,
         'class_stats': class_stats,
         'top_improvers': top_improvers,
         'bottom_improvers': bottom_improvers,
-        'students': students_list
+        'students': students_list,
+        'analytics': analytics
     }
-    
+
+def write_json(final_data, output_path='dashboard/data.json'):
     # Custom JSON encoder for numpy types
     class NpEncoder(json.JSONEncoder):
         def default(self, obj):
@@ -115,10 +130,26 @@ def convert_to_json():
                 return obj.tolist()
             return super(NpEncoder, self).default(obj)
 
-    output_path = 'dashboard/data.json'
     print(f"Exporting to {output_path}...")
-    with open(output_path, 'w', encoding='utf-8') as f:
-        json.dump(final_data, f, ensure_ascii=False, cls=NpEncoder)
+    # Write next to the target and swap it in, so the dashboard never fetches a half-written file
+    fd, tmp_path = tempfile.mkstemp(prefix='.data-', suffix='.json.tmp',
+                                    dir=os.path.dirname(output_path) or '.')
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(final_data, f, ensure_ascii=False, cls=NpEncoder)
+        os.replace(tmp_path, output_path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+def convert_to_json():
+    df_students, df_class, df_subject = load_data()
+    
+    if df_students is None:
+        return
+
+    write_json(build_dashboard_data(df_students, df_class, df_subject))
     print("Done!")
 
 if __name__ == "__main__":
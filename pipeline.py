@@ -0,0 +1,216 @@
+import argparse
+import os
+import sys
+import time
+
+# Only the standard library is imported here. pandas/matplotlib are pulled in
+# by the stage modules, which are imported inside the subcommand that needs them.
+
+SOURCE_FILES = ['diyiciyuekao.xlsx', 'qizhognchengji.xlsx']
+RESULT_FILE = 'analysis_result.xlsx'
+JSON_FILE = 'dashboard/data.json'
+CHART_DIR = 'charts'
+CHART_FILES = ['total_score_distribution.png', 'class_score_boxplot.png', 'rank_change_scatter.png',
+               'subject_comparison_bar.png', 'subject_delta.png']
+
+def positive_int(value):
+    number = int(value)
+    if number < 1:
+        raise argparse.ArgumentTypeError(f"必须是正整数: {value}")
+    return number
+
+def is_stale(targets, sources):
+    # A stage needs to run if any output is missing or older than any input
+    try:
+        oldest_target = min(os.path.getmtime(t) for t in targets)
+    except OSError:
+        return True
+    return any(os.path.getmtime(s) > oldest_target for s in sources if os.path.exists(s))
+
+def run_analyze(args):
+    import analyze_data_full
+    if getattr(args, 'out_of_core', False):
+        analyze_data_full.analyze_out_of_core(num_partitions=args.partitions)
+    else:
+        analyze_data_full.analyze()
+
+def run_export(args):
+    import export_data_to_json
+    export_data_to_json.convert_to_json()
+
+def run_charts(args):
+    import visualize_data_v2
+    visualize_data_v2.main()
+
+def run_verify(args):
+    import verify_result
+    verify_result.verify()
+
+def run_check(args):
+    import verify_equivalence
+    ok = verify_equivalence.verify_equivalence(synthetic_sizes=args.synthetic, rtol=args.rtol, atol=args.atol,
+                                               golden=not args.skip_golden, verbose=args.verbose)
+    return 0 if ok else 1
+
+def run_refresh(args):
+    # Stages run in this one interpreter, so pandas is imported at most once,
+    # and stages whose outputs are already newer than their inputs are skipped.
+    stages = [
+        ('analyze', run_analyze, [RESULT_FILE], SOURCE_FILES),
+        ('export', run_export, [JSON_FILE], [RESULT_FILE]),
+    ]
+    if args.charts:
+        stages.append(('charts', run_charts, [os.path.join(CHART_DIR, f) for f in CHART_FILES], [RESULT_FILE]))
+
+    for name, func, targets, sources in stages:
+        if not args.force and not is_stale(targets, sources):
+            print(f"[{name}] 已是最新，跳过")
+            continue
+        start = time.perf_counter()
+        func(args)
+        if is_stale(targets, sources):
+            print(f"[{name}] 未能生成最新的 {', '.join(targets)}，已停止")
+            return 1
+        print(f"[{name}] 完成 ({time.perf_counter() - start:.2f}s)")
+    return 0
+
+def file_signature(path):
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return (st.st_mtime_ns, st.st_size)
+
+# After a failed update, wait this long before retrying the same save
+WATCH_RETRY_DELAY = 5.0
+
+def rebuild_outputs(df_monthly, df_midterm, charts=False):
+    # Rebuild every output from already-parsed source frames, as watch mode does
+    import analyze_data_full
+    import export_data_to_json
+
+    results = analyze_data_full.build_results(df_monthly, df_midterm)
+    # data.json first so the dashboard is current as soon as possible
+    frames = [export_data_to_json.as_read_back(df) for df in results]
+    export_data_to_json.write_json(export_data_to_json.build_dashboard_data(*frames))
+    analyze_data_full.write_results(*results)
+    if charts:
+        run_charts(None)
+
+def run_watch(args):
+    # Long-running refresh: poll the source workbooks, wait until a changed file
+    # has stopped changing (Excel writes a save in several steps), then reload
+    # only that workbook and rebuild the outputs from the frames kept in memory.
+    import analyze_data_full
+
+    suffixes = dict(zip(SOURCE_FILES, ['Monthly', 'Midterm']))
+    frames = {}
+    loaded = {}   # path -> signature the frame in `frames` was loaded from
+    seen = {}     # path -> (signature, time it was first seen)
+
+    def update(paths, rebuild=True):
+        # Parse into a copy and only keep it once everything succeeded, so a
+        # failure leaves the previous frames (and signatures) in place and the
+        # same save is picked up again on a later poll.
+        start = time.perf_counter()
+        staged = dict(frames)
+        signatures = {}
+        for path in paths:
+            signatures[path] = file_signature(path)
+            df = analyze_data_full.load_data(path, suffixes[path])
+            if df is None:
+                raise RuntimeError(f"{path} 读取失败")
+            staged[path] = df
+        if rebuild and all(p in staged for p in SOURCE_FILES):
+            rebuild_outputs(*(staged[p] for p in SOURCE_FILES), charts=args.charts)
+            print(f"[watch] 数据已更新 ({time.perf_counter() - start:.2f}s)")
+        frames.update(staged)
+        loaded.update(signatures)
+
+    retry_at = 0.0
+    try:
+        update(SOURCE_FILES, rebuild=args.force or is_stale([RESULT_FILE, JSON_FILE], SOURCE_FILES))
+    except Exception as e:
+        print(f"[watch] 更新失败: {e!r}，{WATCH_RETRY_DELAY:.0f} 秒后重试")
+        retry_at = time.monotonic() + WATCH_RETRY_DELAY
+
+    print(f"[watch] 正在监视 {', '.join(SOURCE_FILES)} (Ctrl+C 退出)")
+    try:
+        while True:
+            time.sleep(args.interval)
+            now = time.monotonic()
+            if now < retry_at:
+                continue
+            ready = []
+            for path in SOURCE_FILES:
+                sig = file_signature(path)
+                if sig is None or sig == loaded.get(path):
+                    seen.pop(path, None)
+                    continue
+                if path not in seen or seen[path][0] != sig:
+                    # Still being written: restart the debounce window
+                    seen[path] = (sig, now)
+                elif now - seen[path][1] >= args.debounce:
+                    ready.append(path)
+                    del seen[path]
+
+            if ready:
+                print(f"[watch] 检测到更新: {', '.join(ready)}")
+                try:
+                    update(ready)
+                except Exception as e:
+                    # e.g. analysis_result.xlsx is open in Excel; keep watching
+                    print(f"[watch] 更新失败: {e!r}，{WATCH_RETRY_DELAY:.0f} 秒后重试")
+                    retry_at = time.monotonic() + WATCH_RETRY_DELAY
+    except KeyboardInterrupt:
+        print("[watch] 已停止")
+    return 0
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="学生成绩数据分析流水线")
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    p = sub.add_parser('analyze', help="对比分析两次考试，生成 analysis_result.xlsx")
+    p.add_argument('--out-of-core', action='store_true', help="按学号分区到磁盘后逐分区合并")
+    p.add_argument('--partitions', type=positive_int, default=16, help="磁盘分区数 (默认 16)")
+    p.set_defaults(func=run_analyze)
+
+    p = sub.add_parser('export', help="导出大屏数据 dashboard/data.json")
+    p.set_defaults(func=run_export)
+
+    p = sub.add_parser('charts', help="生成 charts/ 下的静态图表")
+    p.set_defaults(func=run_charts)
+
+    p = sub.add_parser('verify', help="打印 analysis_result.xlsx 各工作表概要")
+    p.set_defaults(func=run_verify)
+
+    p = sub.add_parser('check', help="对比各计算路径与基准输出，检查结果是否一致")
+    p.add_argument('--synthetic', type=int, nargs='*', default=[2000], help="合成名单的人数，可给多个 (默认 2000)")
+    p.add_argument('--rtol', type=float, default=1e-9, help="数值相对误差容限 (默认 1e-9)")
+    p.add_argument('--atol', type=float, default=1e-9, help="数值绝对误差容限 (默认 1e-9)")
+    p.add_argument('--skip-golden', action='store_true', help="不与仓库中已提交的 analysis_result.xlsx / data.json 比较")
+    p.add_argument('--verbose', action='store_true', help="显示各阶段的输出")
+    p.set_defaults(func=run_check)
+
+    p = sub.add_parser('refresh', help="在同一进程中依次执行 analyze/export，跳过已是最新的阶段")
+    p.add_argument('--charts', action='store_true', help="同时更新静态图表")
+    p.add_argument('--force', action='store_true', help="忽略时间戳，强制重新执行所有阶段")
+    p.add_argument('--out-of-core', action='store_true', help="analyze 阶段使用分区合并")
+    p.add_argument('--partitions', type=positive_int, default=16, help="磁盘分区数 (默认 16)")
+    p.set_defaults(func=run_refresh)
+
+    p = sub.add_parser('watch', help="监视源 Excel 文件，保存后自动更新分析结果和大屏数据")
+    p.add_argument('--interval', type=float, default=0.5, help="轮询间隔秒数 (默认 0.5)")
+    p.add_argument('--debounce', type=float, default=1.0, help="文件停止变化多少秒后才重新计算 (默认 1.0)")
+    p.add_argument('--charts', action='store_true', help="同时更新静态图表")
+    p.add_argument('--force', action='store_true', help="启动时无论是否最新都先计算一次")
+    p.set_defaults(func=run_watch)
+
+    return parser
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    return args.func(args) or 0
+
+if __name__ == "__main__":
+    sys.exit(main())
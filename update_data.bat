@@ -3,11 +3,8 @@ echo ========================================================
 echo 正在更新数据分析...
 echo ========================================================
 
-echo 1. 正在执行数据对比分析 (Excel)...
-python analyze_data_full.py
-
-echo 2. 正在导出大屏数据 (JSON)...
-python export_data_to_json.py
+echo 正在执行数据对比分析 (Excel) 并导出大屏数据 (JSON)...
+python pipeline.py refresh
 
 echo.
 echo ========================================================
@@ -0,0 +1,329 @@
+import contextlib
+import io
+import json
+import math
+import os
+import shutil
+import sys
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+import analyze_data_full
+import export_data_to_json
+import pipeline
+
+# Golden-output harness: every way of producing analysis_result.xlsx and
+# dashboard/data.json must agree with the reference path (analyze() followed by
+# convert_to_json()), and the reference path must agree with the committed outputs.
+
+SOURCE_FILES = {'Monthly': 'diyiciyuekao.xlsx', 'Midterm': 'qizhognchengji.xlsx'}
+RESULT_FILE = 'analysis_result.xlsx'
+JSON_FILE = os.path.join('dashboard', 'data.json')
+MAX_REPORTED_DIFFS = 20
+
+# ---------------------------------------------------------------------------
+# Pipeline paths under test. Each runs in a working directory that holds the
+# two source workbooks; new fast paths only need an entry in PATHS.
+# ---------------------------------------------------------------------------
+
+def run_reference():
+    analyze_data_full.analyze()
+    export_data_to_json.convert_to_json()
+
+def run_out_of_core():
+    # Odd partition/chunk sizes so partitions and chunks do not line up
+    analyze_data_full.analyze_out_of_core(num_partitions=7, chunksize=997)
+    export_data_to_json.convert_to_json()
+
+def run_out_of_core_small_chunks():
+    # Chunks small enough that rows without an ID land in some chunks and not
+    # others, so per-chunk dtype guesses disagree
+    analyze_data_full.analyze_out_of_core(num_partitions=3, chunksize=50)
+    export_data_to_json.convert_to_json()
+
+def run_in_memory():
+    # The rebuild `pipeline.py watch` runs: export straight from the merged frames
+    pipeline.rebuild_outputs(
+        analyze_data_full.load_data(SOURCE_FILES['Monthly'], 'Monthly'),
+        analyze_data_full.load_data(SOURCE_FILES['Midterm'], 'Midterm'))
+
+# name -> (function, whether the path is allowed to change row order)
+PATHS = {
+    'out_of_core': (run_out_of_core, True),
+    'out_of_core_small_chunks': (run_out_of_core_small_chunks, True),
+    'in_memory': (run_in_memory, False),
+}
+
+# ---------------------------------------------------------------------------
+# Tolerance- and NaN-aware comparison
+# ---------------------------------------------------------------------------
+
+def _is_missing(value):
+    return value is None or (isinstance(value, float) and math.isnan(value))
+
+def _is_number(value):
+    return isinstance(value, (int, float, np.number)) and not isinstance(value, (bool, np.bool_))
+
+def _same_value(expected, actual):
+    if _is_missing(expected) and _is_missing(actual):
+        return True
+    return type(expected) is type(actual) and expected == actual
+
+def diff_frames(name, expected, actual, rtol, atol, sort_key=None):
+    diffs = []
+    if list(expected.columns) != list(actual.columns):
+        missing = [c for c in expected.columns if c not in actual.columns]
+        extra = [c for c in actual.columns if c not in expected.columns]
+        if missing or extra:
+            return [f"{name}: columns differ (missing {missing}, extra {extra})"]
+        diffs.append(f"{name}: column order differs")
+    if len(expected) != len(actual):
+        return diffs + [f"{name}: {len(expected)} rows expected, got {len(actual)}"]
+
+    if sort_key is not None and sort_key in expected.columns:
+        expected = expected.sort_values(sort_key, key=lambda s: s.astype(str), kind='stable')
+        actual = actual.sort_values(sort_key, key=lambda s: s.astype(str), kind='stable')
+    expected = expected.reset_index(drop=True)
+    actual = actual[expected.columns].reset_index(drop=True)
+
+    for col in expected.columns:
+        e, a = expected[col], actual[col]
+        e_numeric, a_numeric = pd.api.types.is_numeric_dtype(e), pd.api.types.is_numeric_dtype(a)
+        if e_numeric and a_numeric:
+            ev, av = e.to_numpy(dtype=float), a.to_numpy(dtype=float)
+            bad = ~np.isclose(ev, av, rtol=rtol, atol=atol, equal_nan=True)
+        elif e_numeric != a_numeric:
+            diffs.append(f"{name}.{col}: dtype {e.dtype} expected, got {a.dtype}")
+            continue
+        else:
+            # Text/object columns: values must match in type as well, so a
+            # number turning into a string (or back) counts as drift
+            bad = np.array([not _same_value(x, y) for x, y in zip(e.tolist(), a.tolist())], dtype=bool)
+        for i in np.flatnonzero(bad)[:3]:
+            diffs.append(f"{name}[{i}].{col}: expected {e.iloc[i]!r}, got {a.iloc[i]!r}")
+        if bad.sum() > 3:
+            diffs.append(f"{name}.{col}: {int(bad.sum())} values differ in total")
+    return diffs
+
+def diff_json(expected, actual, rtol, atol, path='$'):
+    if _is_missing(expected) and _is_missing(actual):
+        return []
+    if _is_number(expected) and _is_number(actual):
+        if math.isclose(float(expected), float(actual), rel_tol=rtol, abs_tol=atol):
+            return []
+        return [f"{path}: expected {expected!r}, got {actual!r}"]
+    if isinstance(expected, dict) and isinstance(actual, dict):
+        diffs = []
+        for key in expected.keys() - actual.keys():
+            diffs.append(f"{path}.{key}: missing")
+        for key in actual.keys() - expected.keys():
+            diffs.append(f"{path}.{key}: unexpected")
+        for key in expected.keys() & actual.keys():
+            diffs.extend(diff_json(expected[key], actual[key], rtol, atol, f"{path}.{key}"))
+        return diffs
+    if isinstance(expected, list) and isinstance(actual, list):
+        if len(expected) != len(actual):
+            return [f"{path}: {len(expected)} items expected, got {len(actual)}"]
+        diffs = []
+        for i, (e, a) in enumerate(zip(expected, actual)):
+            diffs.extend(diff_json(e, a, rtol, atol, f"{path}[{i}]"))
+        return diffs
+    if type(expected) is not type(actual):
+        return [f"{path}: expected {type(expected).__name__} {expected!r}, got {type(actual).__name__} {actual!r}"]
+    if expected != actual:
+        return [f"{path}: expected {expected!r}, got {actual!r}"]
+    return []
+
+def _normalize_ranked(items, key):
+    # Top-N lists: students with equal `key` may come out in any order, and
+    # the tie at the cut-off may pick different students. Sort within each
+    # tie group, and keep only the value for the cut-off group.
+    if not items:
+        return items
+    boundary = items[-1][key]
+    first_seen = {}
+    for i, item in enumerate(items):
+        first_seen.setdefault(item[key], i)
+    head = [item for item in items if item[key] != boundary]
+    head.sort(key=lambda item: (first_seen[item[key]], json.dumps(item, sort_keys=True, ensure_ascii=False)))
+    return head + [{key: item[key]} for item in items if item[key] == boundary]
+
+def normalize_row_order(data):
+    # For paths that may emit students in a different order: sort the lists
+    # whose order follows the Student_Comparison rows, and only relax the
+    # improver lists within groups of tied values.
+    data = json.loads(json.dumps(data))
+    dist = data.get('global_stats', {}).get('score_distribution', {})
+    for key in dist:
+        dist[key] = sorted(dist[key])
+    data['students'] = sorted(data.get('students', []), key=lambda s: str(s['student_id']))
+    for key in ('top_improvers', 'bottom_improvers'):
+        data[key] = _normalize_ranked(data.get(key, []), 'Improvement_School_Rank')
+    flags = data.get('analytics', {}).get('rank_drop_flags', {})
+    if 'students' in flags:
+        flags['students'] = sorted(flags['students'], key=lambda s: (-s['rank_drop'], str(s['student_id'])))
+    return data
+
+def diff_outputs(expected, actual, rtol, atol, ignore_row_order=False):
+    expected_sheets, expected_json = expected
+    actual_sheets, actual_json = actual
+    diffs = []
+    for sheet in expected_sheets.keys() - actual_sheets.keys():
+        diffs.append(f"sheet {sheet}: missing")
+    for sheet in expected_sheets.keys() & actual_sheets.keys():
+        sort_key = 'StudentID' if ignore_row_order and sheet == 'Student_Comparison' else None
+        diffs.extend(diff_frames(sheet, expected_sheets[sheet], actual_sheets[sheet], rtol, atol, sort_key))
+    if ignore_row_order:
+        expected_json, actual_json = normalize_row_order(expected_json), normalize_row_order(actual_json)
+    diffs.extend(diff_json(expected_json, actual_json, rtol, atol))
+    return diffs
+
+# ---------------------------------------------------------------------------
+# Running paths in isolated working directories
+# ---------------------------------------------------------------------------
+
+def read_outputs(directory='.'):
+    sheets = pd.read_excel(os.path.join(directory, RESULT_FILE), sheet_name=None)
+    with open(os.path.join(directory, JSON_FILE), 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    return sheets, data
+
+def run_path(func, source_dir, verbose=False):
+    workdir = tempfile.mkdtemp(prefix='equivalence_')
+    cwd = os.getcwd()
+    try:
+        for filename in SOURCE_FILES.values():
+            shutil.copy2(os.path.join(source_dir, filename), workdir)
+        os.makedirs(os.path.join(workdir, 'dashboard'))
+        os.chdir(workdir)
+        out = sys.stdout if verbose else io.StringIO()
+        with contextlib.redirect_stdout(out):
+            func()
+        return read_outputs()
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+# ---------------------------------------------------------------------------
+# Synthetic cohorts in the same two-row-header layout as the source workbooks
+# ---------------------------------------------------------------------------
+
+def _write_workbook(path, df):
+    import openpyxl
+
+    wb = openpyxl.Workbook(write_only=True)
+    ws = wb.create_sheet('总分')
+    metrics = ['分数', '联考排名', '学校排名', '班级排名']
+    ws.append(['合成数据-总分-排行榜'])
+    top = ['姓名', '考号', '学号', '班级', '标签']
+    bottom = [None] * 5
+    for subject in ['总分'] + analyze_data_full.SUBJECTS:
+        top += [subject, None, None, None]
+        bottom += metrics
+    ws.append(top)
+    ws.append(bottom)
+    for row in df.itertuples(index=False, name=None):
+        ws.append([None if _is_missing(v) else v for v in row])
+    wb.save(path)
+
+def _exam_frame(ids, names, classes, scores, rng):
+    df = pd.DataFrame({'姓名': names, '考号': [f"2025{i:07d}" for i in range(len(ids))],
+                       '学号': ids, '班级': classes.astype(str), '标签': '--'})
+    columns = {}
+    total = np.zeros(len(ids))
+    for subject in analyze_data_full.SUBJECTS:
+        score = scores[subject]
+        total += np.nan_to_num(score)
+        columns[subject] = score
+    columns = {'总分': total, **columns}
+    for subject, score in columns.items():
+        s = pd.Series(score)
+        df[f"{subject}_分数"] = s
+        school_rank = s.rank(method='min', ascending=False)
+        # One school of a larger district: joint ranks spread further than school ranks
+        df[f"{subject}_联考排名"] = school_rank * 3 - 1
+        df[f"{subject}_学校排名"] = school_rank
+        df[f"{subject}_班级排名"] = s.groupby(classes).rank(method='min', ascending=False)
+    order = rng.permutation(len(df))
+    return df.iloc[order]
+
+def make_synthetic_cohort(directory, n_students, seed=0, numeric_ids=False):
+    rng = np.random.default_rng(seed)
+    if numeric_ids:
+        # Plain student numbers, stored as numeric cells
+        ids = pd.unique(rng.integers(10**9, 10**10, n_students)).astype(object)
+    else:
+        ids = np.char.add('1506', rng.integers(10**13, 10**14, n_students).astype(str)).astype(object)
+        # Some IDs end in X, as real ID numbers can
+        x_mask = rng.random(n_students) < 0.05
+        ids[x_mask] = [s[:-1] + 'X' for s in ids[x_mask]]
+        ids = pd.unique(ids)
+    n = len(ids)
+    names = np.array([f"学生{i}" for i in range(n)], dtype=object)
+    classes = rng.integers(1, max(2, n // 45) + 1, n)
+
+    base = {s: rng.normal(70, 15, n).clip(0, 120).round(1) for s in analyze_data_full.SUBJECTS}
+    later = {s: (v + rng.normal(0, 8, n)).clip(0, 120).round(1) for s, v in base.items()}
+    for scores in (base, later):
+        for v in scores.values():
+            v[rng.random(n) < 0.02] = np.nan  # Absent for one subject
+
+    # A few students sat only one of the two exams
+    in_monthly = rng.random(n) >= 0.02
+    in_midterm = rng.random(n) >= 0.02
+    for suffix, scores, mask in (('Monthly', base, in_monthly), ('Midterm', later, in_midterm)):
+        df = _exam_frame(ids[mask], names[mask], classes[mask],
+                         {s: v[mask] for s, v in scores.items()}, rng)
+        # A few rows without an ID and a note row at the bottom; both are dropped
+        df.loc[rng.random(len(df)) < 0.005, '学号'] = None
+        df = pd.concat([df, pd.DataFrame({'姓名': ['注：未填写学号的学生不参与对比']})], ignore_index=True)
+        _write_workbook(os.path.join(directory, SOURCE_FILES[suffix]), df)
+
+# ---------------------------------------------------------------------------
+
+def check_fixture(name, source_dir, rtol, atol, golden=None, verbose=False):
+    # Compare every path with the reference path (and the reference with the
+    # golden outputs, when given); returns the number of failing comparisons.
+    print(f"\n=== {name} ===")
+    failures = 0
+    reference = run_path(run_reference, source_dir, verbose)
+
+    comparisons = []
+    if golden is not None:
+        comparisons.append(('reference vs golden', golden, reference, False))
+    for path_name, (func, reorders) in PATHS.items():
+        comparisons.append((f"{path_name} vs reference", reference, run_path(func, source_dir, verbose), reorders))
+
+    for label, expected, actual, reorders in comparisons:
+        diffs = diff_outputs(expected, actual, rtol, atol, ignore_row_order=reorders)
+        if diffs:
+            failures += 1
+            print(f"FAIL {label}: {len(diffs)} differences")
+            for d in diffs[:MAX_REPORTED_DIFFS]:
+                print(f"    {d}")
+        else:
+            print(f"ok   {label}")
+    return failures
+
+def verify_equivalence(synthetic_sizes=(2000,), rtol=1e-9, atol=1e-9, golden=True, verbose=False):
+    failures = check_fixture('fixture workbooks', '.', rtol, atol,
+                             golden=read_outputs() if golden else None, verbose=verbose)
+
+    for size in synthetic_sizes:
+        for numeric_ids in (False, True):
+            directory = tempfile.mkdtemp(prefix='synthetic_cohort_')
+            try:
+                make_synthetic_cohort(directory, size, numeric_ids=numeric_ids)
+                kind = 'numeric IDs' if numeric_ids else 'text IDs'
+                failures += check_fixture(f"synthetic cohort ({size} students, {kind})", directory, rtol, atol,
+                                          verbose=verbose)
+            finally:
+                shutil.rmtree(directory, ignore_errors=True)
+
+    print("\nAll outputs equivalent." if failures == 0 else f"\n{failures} comparison(s) failed.")
+    return failures == 0
+
+if __name__ == "__main__":
+    sys.exit(0 if verify_equivalence() else 1)
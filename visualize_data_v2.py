@@ -2,10 +2,31 @@ import pandas as pd
 import matplotlib.pyplot as plt
 import seaborn as sns
 import os
+import json
 import platform
 import matplotlib.font_manager as fm
 
+FONT_CACHE_FILE = '.font_cache.json'
+
+def _load_cached_font():
+    # Cached {"path", "name"} from a previous run; invalid if the font file is gone
+    try:
+        with open(FONT_CACHE_FILE, 'r', encoding='utf-8') as f:
+            cached = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if cached.get('path') and os.path.exists(cached['path']):
+        return cached
+    return None
+
 def set_chinese_font():
+    # Reuse the font resolved last time so the font file is not parsed again
+    cached = _load_cached_font()
+    if cached:
+        plt.rcParams['font.family'] = cached['name']
+        plt.rcParams['axes.unicode_minus'] = False
+        return
+
     # Try to find a Chinese font
     font_path = None
     
@@ -24,6 +45,11 @@ def set_chinese_font():
     if font_path:
         prop = fm.FontProperties(fname=font_path)
         plt.rcParams['font.family'] = prop.get_name()
+        try:
+            with open(FONT_CACHE_FILE, 'w', encoding='utf-8') as f:
+                json.dump({'path': font_path, 'name': prop.get_name()}, f, ensure_ascii=False)
+        except OSError:
+            pass
     else:
         # Fallback
         plt.rcParams['font.sans-serif'] = ['SimHei', 'Microsoft YaHei', 'SimSun', 'Arial Unicode MS']
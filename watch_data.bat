@@ -0,0 +1,10 @@
+@echo off
+echo ========================================================
+echo 正在监视源数据文件，保存 Excel 后将自动更新大屏数据...
+echo ========================================================
+echo.
+echo (按 Ctrl+C 可停止监视)
+echo.
+
+python pipeline.py watch
+pause